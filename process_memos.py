@@ -4,19 +4,55 @@ Voice Memo Analysis Pipeline
 Processes transcribed voice memos through multiple focused LLM analyses
 """
 
+import asyncio
+import fcntl
+import hashlib
 import json
+import logging
+import logging.handlers
 import os
+import queue
+import re
+import sqlite3
 import sys
+import tempfile
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 from datetime import datetime
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import orjson  # Optional: much faster JSON parsing and serialization
+except ImportError:
+    orjson = None
 
 # Configuration
 OLLAMA_API_BASE = "http://localhost:11434/api"
 MODEL_NAME = "llama3.2:3b"  # Adjust to your preferred model
 VOICE_MEMOS_DIR = Path("/mnt/voice_memos")
 OUTPUT_DIR = VOICE_MEMOS_DIR / "analysis"
+CACHE_DIR = VOICE_MEMOS_DIR / ".llm_cache"  # Ollama responses keyed by request hash
+USE_CACHE = True
+KEEP_ALIVE = "1h"  # Keep the model loaded between requests
+MAX_TRANSCRIPT_CHARS = 6000  # Longer transcripts are clipped before analysis (0 = never)
+EMBED_MODEL = "nomic-embed-text"  # Used by --dedup to spot near-duplicate memos
+DEDUP = False
+DEDUP_THRESHOLD = 0.95  # Cosine similarity above which a memo reuses an earlier analysis
+EMBEDDINGS_DIR = OUTPUT_DIR / ".embeddings"  # embeddings.npy (N x D) + memo_ids.txt
+# Memos processed at once with --all; match the server's OLLAMA_NUM_PARALLEL.
+# The server reads 0 as "auto", so values below 1 mean one at a time here
+try:
+    OLLAMA_NUM_PARALLEL = max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", "4")))
+except ValueError:
+    OLLAMA_NUM_PARALLEL = 4
+
+logger = logging.getLogger("process_memos")
+
+ANALYSIS_TYPES = ['projects', 'tasks', 'personal', 'writing']  # Each is a column of the analyses table
+ANALYSIS_COLUMNS = ", ".join(ANALYSIS_TYPES)
 
 # Create analysis subdirectories
 ANALYSIS_DIRS = {
@@ -27,36 +63,290 @@ ANALYSIS_DIRS = {
     'daily': OUTPUT_DIR / "daily_summaries"
 }
 
+# All analyses of a memo in one row; the per-type JSON files are only written with --export
+ANALYSIS_DB = OUTPUT_DIR / "analyses.db"
+EXPORT_JSON = False
+
+# One line per writing idea, read by writing_assistant.py --list-ideas
+WRITING_INDEX = ANALYSIS_DIRS['writing'] / "_index.jsonl"
+
+# Shared HTTP session so every Ollama call reuses a kept-alive connection
+SESSION = requests.Session()
+SESSION.headers.update({"Content-Type": "application/json"})
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+def setup_logging():
+    """Route progress messages through a queue so concurrent tasks never wait on stderr"""
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    return listener
+
+def warm_up_model(model=None):
+    """Load the model before the first real request so it doesn't pay the load time"""
+    try:
+        response = SESSION.post(
+            f"{OLLAMA_API_BASE}/generate",
+            json={"model": model or MODEL_NAME, "prompt": "", "keep_alive": KEEP_ALIVE},
+            timeout=300
+        )
+        response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"Warning: could not preload model: {e}")
+
+def json_loads(data):
+    """Parse JSON from str or bytes, using orjson when it is installed"""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def read_json(path):
+    """Load a JSON file"""
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
+
+def json_dumps(data):
+    """Serialize data compactly, as bytes with orjson or str without it"""
+    if orjson:
+        return orjson.dumps(data)
+    return json.dumps(data)
+
+def write_json(path, data):
+    """Write data to a JSON file with 2-space indentation"""
+    if orjson:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+def writing_index_lines(memo_id, data):
+    """Index lines for one writing analysis; None marks a memo with no ideas"""
+    return "".join(
+        json.dumps({
+            'memo_id': data.get('memo_id', memo_id),
+            'idea': idea,
+            'timestamp': data.get('timestamp', '')
+        }) + "\n"
+        for idea in data.get('writing_ideas') or [None]
+    )
+
+def append_writing_index(data):
+    """Record a memo's writing ideas in the index so listing them needs no rescan"""
+    with open(WRITING_INDEX, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(writing_index_lines(data['memo_id'], data))
+
+def backfill_writing_index():
+    """Create the writing ideas index from every analysis stored so far, if it doesn't exist yet
+
+    Archives from before the index would otherwise only list memos processed since.
+    The check runs under the index lock, so concurrent runs backfill it once.
+    """
+    with open(WRITING_INDEX, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        if os.fstat(f.fileno()).st_size:
+            return
+        
+        con = connect_db()
+        try:
+            analyses = {
+                memo_id: json_loads(blob)
+                for memo_id, blob in con.execute("SELECT memo_id, writing FROM analyses WHERE writing IS NOT NULL")
+            }
+        finally:
+            con.close()
+        with os.scandir(ANALYSIS_DIRS['writing']) as entries:
+            for entry in entries:
+                memo_id = entry.name[:-len("_writing.json")]
+                if not entry.name.endswith("_writing.json") or memo_id in analyses:
+                    continue  # Not an analysis, or an --export copy of a stored one
+                try:
+                    analyses[memo_id] = read_json(entry.path)
+                except Exception as e:
+                    logger.warning(f"Error reading {entry.path}: {e}")
+        
+        f.write("".join(writing_index_lines(memo_id, analyses[memo_id]) for memo_id in sorted(analyses)))
+
 def ensure_directories():
     """Create analysis directory structure"""
     for dir_path in ANALYSIS_DIRS.values():
         dir_path.mkdir(parents=True, exist_ok=True)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    con = connect_db()
+    try:
+        con.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        con.execute(f"""CREATE TABLE IF NOT EXISTS analyses (
+            memo_id TEXT PRIMARY KEY, date TEXT, timestamp TEXT,
+            {", ".join(f"{atype} BLOB" for atype in ANALYSIS_TYPES)})""")
+        # A database from before an analysis type was added gets its column now
+        columns = {row[1] for row in con.execute("PRAGMA table_info(analyses)")}
+        for atype in ANALYSIS_TYPES:
+            if atype not in columns:
+                con.execute(f"ALTER TABLE analyses ADD COLUMN {atype} BLOB")
+        con.execute("CREATE INDEX IF NOT EXISTS analyses_date ON analyses (date)")
+        con.commit()
+    finally:
+        con.close()
+    backfill_writing_index()
+
+def connect_db():
+    """Open the analysis database; each thread uses its own connection"""
+    return sqlite3.connect(ANALYSIS_DB, timeout=30)
+
+def store_analyses(memo_id, timestamp, analyses):
+    """Write all of a memo's analyses as a single row"""
+    con = connect_db()
+    try:
+        with con:
+            con.execute(
+                f"INSERT OR REPLACE INTO analyses (memo_id, date, timestamp, {ANALYSIS_COLUMNS}) "
+                f"VALUES (?, ?, ?{', ?' * len(ANALYSIS_TYPES)})",
+                (memo_id, timestamp[:10].replace('-', ''), timestamp,
+                 *[json_dumps(analyses[atype]) if analyses.get(atype) else None
+                   for atype in ANALYSIS_TYPES])
+            )
+    finally:
+        con.close()
+
+def row_to_analyses(row):
+    """Decode a row of the ANALYSIS_TYPES columns, in that order"""
+    return {atype: json_loads(blob) for atype, blob in zip(ANALYSIS_TYPES, row) if blob}
+
+def load_analyses(memo_id):
+    """A memo's analyses from the database, falling back to exported JSON files"""
+    con = connect_db()
+    try:
+        row = con.execute(
+            f"SELECT {ANALYSIS_COLUMNS} FROM analyses WHERE memo_id = ?", (memo_id,)
+        ).fetchone()
+    finally:
+        con.close()
+    if row:
+        return row_to_analyses(row)
+    
+    analyses = {}
+    for atype in ANALYSIS_TYPES:
+        try:
+            analyses[atype] = read_json(ANALYSIS_DIRS[atype] / f"{memo_id}_{atype}.json")
+        except (FileNotFoundError, ValueError):
+            continue
+    return analyses
+
+def cache_key(request):
+    """Hash everything in a generate request that affects the model's output"""
+    payload = json.dumps(request, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def read_cached_response(key):
+    """Return a previously stored response, or None on a miss"""
+    try:
+        return (CACHE_DIR / f"{key}.txt").read_text()
+    except FileNotFoundError:
+        return None
+
+def write_cached_response(key, response):
+    """Store a response atomically so concurrent writers never leave partial files"""
+    try:
+        with tempfile.NamedTemporaryFile('w', dir=CACHE_DIR, suffix=".tmp", delete=False) as f:
+            f.write(response)
+        os.replace(f.name, CACHE_DIR / f"{key}.txt")
+    except Exception as e:
+        logger.warning(f"Warning: could not cache response: {e}")
 
-def call_ollama(prompt, model=MODEL_NAME):
-    """Call Ollama API with error handling"""
+def read_json_stream(response):
+    """Collect a streamed generate response, returning as soon as the JSON value is complete"""
+    parts = []
+    depth = 0
+    in_string = escaped = False
+    for line in response.iter_lines():
+        if not line:
+            continue
+        chunk = json_loads(line)
+        if "error" in chunk:
+            raise RuntimeError(chunk["error"])
+        
+        piece = chunk.get("response", "")
+        for i, char in enumerate(piece):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                depth += 1
+            elif char in '}]':
+                depth -= 1
+                if depth == 0:
+                    parts.append(piece[:i + 1])
+                    return "".join(parts)
+        parts.append(piece)
+        
+        if chunk.get("done"):
+            break
+    return "".join(parts)
+
+def call_ollama(prompt, model=None, max_tokens=512):
+    """Call Ollama API with error handling, reusing cached responses"""
+    request = {
+        "model": model or MODEL_NAME,
+        "prompt": prompt,
+        "format": "json",  # Constrain decoding so every response parses
+        "options": {
+            "temperature": 0.3,
+            "top_p": 0.9,
+            "num_predict": max_tokens,  # Caps runaway output after the JSON
+            "stop": ["\n\n\n"]
+        }
+    }
+    key = cache_key(request)
+    if USE_CACHE:
+        cached = read_cached_response(key)
+        if cached is not None:
+            return cached
+    
     try:
-        response = requests.post(
+        response = SESSION.post(
             f"{OLLAMA_API_BASE}/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,
-                    "top_p": 0.9
-                }
-            },
+            json={**request, "stream": True, "keep_alive": KEEP_ALIVE},
+            stream=True,
             timeout=300
         )
-        response.raise_for_status()
-        return response.json()["response"]
+        # Leaving the block closes the connection, which stops generation on
+        # the server if we returned before it finished
+        with response:
+            response.raise_for_status()
+            result = read_json_stream(response)
     except Exception as e:
-        print(f"Error calling Ollama API: {e}")
+        logger.error(f"Error calling Ollama API: {e}")
         return None
+    
+    # JSON cut short by num_predict or a dropped stream is returned for the caller
+    # to report, but not cached, so the next run asks the server again
+    try:
+        json_loads(result)
+    except json.JSONDecodeError:
+        return result
+    write_cached_response(key, result)
+    return result
 
-def extract_projects(text, memo_id):
-    """Extract project outlines and ideas"""
-    prompt = f"""Analyze this voice memo transcript for project-related content. Extract:
+async def call_ollama_async(prompt, model=None, max_tokens=512):
+    """Run call_ollama in a worker thread so several requests can be in flight"""
+    return await asyncio.to_thread(call_ollama, prompt, model, max_tokens)
+
+# Analysis prompt templates, filled in with .format(text=transcript)
+_TEMPLATES = {
+    'projects': """Analyze this voice memo transcript for project-related content. Extract:
 
 1. PROJECT IDEAS: New project concepts mentioned
 2. PROJECT UPDATES: Progress on existing projects
@@ -68,22 +358,8 @@ Only include items that are clearly project-related. If nothing found, return em
 Transcript:
 {text}
 
-JSON Response:"""
-    
-    response = call_ollama(prompt)
-    if response:
-        try:
-            data = json.loads(response.strip())
-            data['memo_id'] = memo_id
-            data['timestamp'] = datetime.now().isoformat()
-            return data
-        except json.JSONDecodeError:
-            print(f"Failed to parse projects JSON for {memo_id}")
-    return None
-
-def extract_tasks(text, memo_id):
-    """Extract actionable tasks and reminders"""
-    prompt = f"""Extract actionable items from this voice memo:
+JSON Response:""",
+    'tasks': """Extract actionable items from this voice memo:
 
 1. TODO ITEMS: Specific tasks to complete
 2. REMINDERS: Things to remember or follow up on
@@ -96,22 +372,8 @@ If nothing found, return empty arrays.
 Transcript:
 {text}
 
-JSON Response:"""
-    
-    response = call_ollama(prompt)
-    if response:
-        try:
-            data = json.loads(response.strip())
-            data['memo_id'] = memo_id
-            data['timestamp'] = datetime.now().isoformat()
-            return data
-        except json.JSONDecodeError:
-            print(f"Failed to parse tasks JSON for {memo_id}")
-    return None
-
-def extract_personal_insights(text, memo_id):
-    """Extract mood, sleep, and personal observations"""
-    prompt = f"""Analyze this voice memo for personal insights:
+JSON Response:""",
+    'personal': """Analyze this voice memo for personal insights:
 
 1. MOOD_SENTIMENT: Overall emotional tone (positive/negative/neutral/mixed)
 2. SLEEP_QUALITY: Any mentions of sleep, rest, fatigue, energy levels
@@ -125,22 +387,8 @@ If nothing found for a category, use null.
 Transcript:
 {text}
 
-JSON Response:"""
-    
-    response = call_ollama(prompt)
-    if response:
-        try:
-            data = json.loads(response.strip())
-            data['memo_id'] = memo_id
-            data['timestamp'] = datetime.now().isoformat()
-            return data
-        except json.JSONDecodeError:
-            print(f"Failed to parse personal JSON for {memo_id}")
-    return None
-
-def extract_writing_content(text, memo_id):
-    """Extract writing ideas and content"""
-    prompt = f"""Analyze this voice memo for writing-related content:
+JSON Response:""",
+    'writing': """Analyze this voice memo for writing-related content:
 
 1. WRITING_IDEAS: Story ideas, article topics, creative concepts
 2. ROUGH_DRAFTS: Any narrative or structured content that could become writing
@@ -153,60 +401,355 @@ Transcript:
 {text}
 
 JSON Response:"""
+}
+
+# All four analyses in one prompt; the keys match _TEMPLATES
+_COMBINED_TEMPLATE = """Analyze this voice memo transcript and return one JSON object with exactly four top-level keys: "projects", "tasks", "personal", "writing".
+
+"projects": project-related content, as an object with keys project_ideas, project_updates, project_planning
+- project_ideas: New project concepts mentioned
+- project_updates: Progress on existing projects
+- project_planning: Steps, timelines, or resource needs mentioned
+Only include items that are clearly project-related. If nothing found, use empty arrays.
+
+"tasks": actionable items, as an object with keys todo_items, reminders, deadlines
+- todo_items: Specific tasks to complete
+- reminders: Things to remember or follow up on
+- deadlines: Time-sensitive items mentioned
+Each item should include the text and estimated priority (high/medium/low). If nothing found, use empty arrays.
+
+"personal": personal insights, as an object with keys mood_sentiment, sleep_quality, stress_indicators, needs_support, self_reflection
+- mood_sentiment: Overall emotional tone (positive/negative/neutral/mixed)
+- sleep_quality: Any mentions of sleep, rest, fatigue, energy levels
+- stress_indicators: Signs of stress, overwhelm, or anxiety
+- needs_support: Areas where financial or other support is mentioned
+- self_reflection: Personal insights or self-observations
+Provide brief quotes from the transcript as evidence. If nothing found for a category, use null.
+
+"writing": writing-related content, as an object with keys writing_ideas, rough_drafts, quotes_phrases, interview_questions
+- writing_ideas: Story ideas, article topics, creative concepts
+- rough_drafts: Any narrative or structured content that could become writing
+- quotes_phrases: Interesting turns of phrase, metaphors, or quotable moments
+- interview_questions: 2-3 specific follow-up questions that would help develop the ideas mentioned
+
+Transcript:
+{text}
+
+JSON Response:"""
+
+# Expected keys per analysis: list fields default to [], the rest to None
+_SCHEMAS = {
+    'projects': {'project_ideas': list, 'project_updates': list, 'project_planning': list},
+    'tasks': {'todo_items': list, 'reminders': list, 'deadlines': list},
+    'personal': {'mood_sentiment': None, 'sleep_quality': None, 'stress_indicators': None,
+                 'needs_support': None, 'self_reflection': None},
+    'writing': {'writing_ideas': list[str], 'rough_drafts': list[str], 'quotes_phrases': list[str],
+                'interview_questions': list[str]}
+}
+_TEXT_KEYS = ('title', 'text', 'idea', 'question', 'phrase', 'quote', 'draft', 'description')
+
+def as_text(item):
+    """A string for one list element; objects give their main text field, anything else its JSON"""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        for key in _TEXT_KEYS:
+            if isinstance(item.get(key), str):
+                return item[key]
+    return json.dumps(item)
+
+def normalize_analysis(analysis_type, data, memo_id, timestamp):
+    """Coerce model output to the expected schema so readers can rely on key names and types"""
+    data = {str(key).strip().lower().replace(' ', '_'): value for key, value in data.items()}
+    for key, kind in _SCHEMAS[analysis_type].items():
+        value = data.get(key)
+        if kind is list or kind == list[str]:
+            if value is None or value == "":
+                value = []
+            elif not isinstance(value, list):
+                value = [value]
+            if kind == list[str]:  # Models often return ideas and questions as objects
+                value = [as_text(item) for item in value if item is not None]
+        data[key] = value
+    data['memo_id'] = memo_id
+    data['timestamp'] = timestamp
+    return data
+
+async def extract_analysis(analysis_type, text, memo_id, timestamp):
+    """Run a single analysis with its own prompt; used when the combined request misses a section"""
+    prompt = _TEMPLATES[analysis_type].format(text=text)
     
-    response = call_ollama(prompt)
+    response = await call_ollama_async(prompt)
     if response:
         try:
-            data = json.loads(response.strip())
-            data['memo_id'] = memo_id
-            data['timestamp'] = datetime.now().isoformat()
-            return data
+            data = json_loads(response)
         except json.JSONDecodeError:
-            print(f"Failed to parse writing JSON for {memo_id}")
+            logger.warning(f"Failed to parse {analysis_type} JSON for {memo_id}")
+            return None
+        if isinstance(data, dict):
+            return normalize_analysis(analysis_type, data, memo_id, timestamp)
+        logger.warning(f"Unexpected {analysis_type} JSON for {memo_id}")
     return None
 
-def process_memo(memo_path):
+async def extract_all(text, memo_id, timestamp):
+    """Run all four analyses in a single request so the transcript is only processed once"""
+    prompt = _COMBINED_TEMPLATE.format(text=text)
+    
+    response = await call_ollama_async(prompt, max_tokens=1536)  # Room for all four sections
+    if response:
+        try:
+            combined = json_loads(response)
+        except json.JSONDecodeError:
+            logger.warning(f"Failed to parse combined JSON for {memo_id}")
+            return {}
+        
+        analyses = {}
+        for analysis_type in _TEMPLATES:
+            data = combined.get(analysis_type, combined.get(analysis_type.upper())) if isinstance(combined, dict) else None
+            if isinstance(data, dict):
+                analyses[analysis_type] = normalize_analysis(analysis_type, data, memo_id, timestamp)
+        return analyses
+    return {}
+
+def clip_transcript(text, max_chars=None):
+    """Shorten a long transcript, keeping whole sentences from its start and end"""
+    if max_chars is None:
+        max_chars = MAX_TRANSCRIPT_CHARS
+    if not max_chars or len(text) <= max_chars:
+        return text
+    
+    separator = " … "
+    half = (max_chars - len(separator)) // 2
+    if half <= 0:  # No room for both ends around the separator
+        return text[:max_chars]
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    
+    head, used = [], 0
+    for sentence in sentences:
+        if used + len(sentence) + 1 > half:
+            break
+        head.append(sentence)
+        used += len(sentence) + 1
+    
+    tail, used = [], 0
+    for sentence in reversed(sentences[len(head):]):
+        if used + len(sentence) + 1 > half:
+            break
+        tail.append(sentence)
+        used += len(sentence) + 1
+    tail.reverse()
+    
+    # Fall back to a plain character cut when a single sentence exceeds the budget
+    head_text = " ".join(head) if head else text[:half]
+    tail_text = " ".join(tail) if tail else text[-half:]
+    return head_text + separator + tail_text
+
+def save_analysis(memo_id, analysis_type, data):
+    """Export one analysis as a JSON file in its output directory"""
+    output_file = ANALYSIS_DIRS[analysis_type] / f"{memo_id}_{analysis_type}.json"
+    write_json(output_file, data)
+
+_embedding_lock = threading.Lock()
+_embedding_index = None  # (memo_ids, matrix), loaded on first use
+
+def embed_text(text):
+    """Embed a transcript with Ollama's embeddings endpoint"""
+    response = SESSION.post(
+        f"{OLLAMA_API_BASE}/embeddings",
+        json={"model": EMBED_MODEL, "prompt": text, "keep_alive": KEEP_ALIVE},
+        timeout=300
+    )
+    response.raise_for_status()
+    return response.json()["embedding"]
+
+def load_embedding_index():
+    """Load the embeddings of previously processed memos (call with the lock held)"""
+    global _embedding_index
+    import numpy as np
+    if _embedding_index is None:
+        try:
+            memo_ids = (EMBEDDINGS_DIR / "memo_ids.txt").read_text().split()
+            matrix = np.load(EMBEDDINGS_DIR / "embeddings.npy")
+        except FileNotFoundError:
+            memo_ids, matrix = [], None
+        if matrix is not None and len(matrix) != len(memo_ids):
+            logger.warning("Warning: embedding index is inconsistent, starting a new one")
+            memo_ids, matrix = [], None
+        _embedding_index = (memo_ids, matrix)
+    return _embedding_index
+
+def find_similar_memo(embedding):
+    """Return (memo_id, similarity) of the closest indexed memo, or None"""
+    import numpy as np
+    vector = np.asarray(embedding, dtype=np.float32)
+    with _embedding_lock:
+        memo_ids, matrix = load_embedding_index()
+    if matrix is None or matrix.shape[1] != vector.shape[0]:
+        return None
+    
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+    sims = matrix @ vector / np.maximum(norms, 1e-12)
+    best = int(sims.argmax())
+    return memo_ids[best], float(sims[best])
+
+def add_to_embedding_index(memo_id, embedding):
+    """Append a memo's embedding and persist the index atomically"""
+    global _embedding_index
+    import numpy as np
+    vector = np.asarray(embedding, dtype=np.float32)[None, :]
+    with _embedding_lock:
+        memo_ids, matrix = load_embedding_index()
+        if matrix is not None and matrix.shape[1] != vector.shape[1]:
+            logger.warning(f"Warning: {EMBED_MODEL} dimension changed, starting a new embedding index")
+            memo_ids, matrix = [], None
+        if memo_id in memo_ids:  # Reprocessed memo: replace its old embedding
+            keep = [i for i, mid in enumerate(memo_ids) if mid != memo_id]
+            memo_ids, matrix = [memo_ids[i] for i in keep], matrix[keep]
+        memo_ids = memo_ids + [memo_id]
+        matrix = vector if matrix is None else np.concatenate([matrix, vector])
+        _embedding_index = (memo_ids, matrix)
+        
+        EMBEDDINGS_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=EMBEDDINGS_DIR, suffix=".npy", delete=False) as f:
+            np.save(f, matrix)
+        os.replace(f.name, EMBEDDINGS_DIR / "embeddings.npy")
+        with tempfile.NamedTemporaryFile('w', dir=EMBEDDINGS_DIR, suffix=".tmp", delete=False) as f:
+            f.write("\n".join(memo_ids) + "\n")
+        os.replace(f.name, EMBEDDINGS_DIR / "memo_ids.txt")
+
+def clone_analyses(source_id, memo_id, timestamp):
+    """Copy a prior memo's analyses under a new memo_id and timestamp"""
+    analyses = load_analyses(source_id)
+    for data in analyses.values():
+        data['memo_id'] = memo_id
+        data['timestamp'] = timestamp
+    return analyses
+
+async def process_memo_async(memo_path):
     """Process a single memo through all analysis functions"""
     memo_id = memo_path.stem
-    print(f"Processing {memo_id}...")
+    logger.info(f"Processing {memo_id}...")
     
-    # Read transcript
+    # Read transcript (off the event loop, so other memos keep progressing)
     try:
-        with open(memo_path, 'r') as f:
-            text = f.read().strip()
+        text = (await asyncio.to_thread(memo_path.read_text)).strip()
     except Exception as e:
-        print(f"Error reading {memo_path}: {e}")
+        logger.error(f"Error reading {memo_path}: {e}")
         return
     
     if not text:
-        print(f"Empty transcript for {memo_id}")
+        logger.info(f"Empty transcript for {memo_id}")
         return
     
-    # Run analyses
-    analyses = {
-        'projects': extract_projects(text, memo_id),
-        'tasks': extract_tasks(text, memo_id),
-        'personal': extract_personal_insights(text, memo_id),
-        'writing': extract_writing_content(text, memo_id)
-    }
+    text = clip_transcript(text)
     
-    # Save results
-    for analysis_type, data in analyses.items():
-        if data:
-            output_file = ANALYSIS_DIRS[analysis_type] / f"{memo_id}_{analysis_type}.json"
-            try:
-                with open(output_file, 'w') as f:
-                    json.dump(data, f, indent=2)
-                print(f"  ✓ Saved {analysis_type} analysis")
-            except Exception as e:
-                print(f"  ✗ Failed to save {analysis_type}: {e}")
+    timestamp = datetime.now().isoformat()
+    
+    # With --dedup, a near-duplicate of an earlier memo reuses its analyses
+    analyses = {}
+    embedding = None
+    if DEDUP:
+        try:
+            embedding = await asyncio.to_thread(embed_text, text)
+            match = await asyncio.to_thread(find_similar_memo, embedding)
+        except Exception as e:
+            logger.warning(f"Warning: could not check {memo_id} for duplicates: {e}")
+            match = None
+        if match and match[0] != memo_id and match[1] > DEDUP_THRESHOLD:
+            analyses = await asyncio.to_thread(clone_analyses, match[0], memo_id, timestamp)
+            if analyses:
+                logger.info(f"  ≈ Near-duplicate of {match[0]} (similarity {match[1]:.3f}), reusing its analyses")
+    
+    # Run all analyses in one request, then retry any missing sections
+    # individually (concurrently, as independent Ollama requests)
+    if not analyses:
+        analyses = await extract_all(text, memo_id, timestamp)
+    missing = [atype for atype in _TEMPLATES if atype not in analyses]
+    if missing:
+        results = await asyncio.gather(
+            *[extract_analysis(atype, text, memo_id, timestamp) for atype in missing]
+        )
+        analyses.update(zip(missing, results))
+    
+    analyses = {atype: data for atype, data in analyses.items() if data}
+    if not analyses:
+        logger.error(f"  ✗ No analyses produced for {memo_id}")
+        return
+    try:
+        await asyncio.to_thread(store_analyses, memo_id, timestamp, analyses)
+    except Exception as e:
+        logger.error(f"  ✗ Failed to save analyses: {e}")
+        return
+    if 'writing' in analyses:
+        await asyncio.to_thread(append_writing_index, analyses['writing'])
+    logger.info(f"  ✓ Saved {', '.join(analyses)} analyses")
+    
+    # With --export, also write the per-type JSON files (concurrently)
+    if EXPORT_JSON:
+        saved = list(analyses.items())
+        results = await asyncio.gather(
+            *[asyncio.to_thread(save_analysis, memo_id, atype, data) for atype, data in saved],
+            return_exceptions=True
+        )
+        for (analysis_type, _), error in zip(saved, results):
+            if error:
+                logger.error(f"  ✗ Failed to export {analysis_type}: {error}")
+    
+    if embedding is not None:
+        try:
+            await asyncio.to_thread(add_to_embedding_index, memo_id, embedding)
+        except Exception as e:
+            logger.warning(f"Warning: could not index {memo_id} for dedup: {e}")
+
+def process_memo(memo_path):
+    """Synchronous entry point for processing a single memo"""
+    asyncio.run(process_memo_async(memo_path))
+
+def processed_memo_ids():
+    """Memo ids in the database or with at least one legacy analysis file"""
+    con = connect_db()
+    try:
+        processed = {memo_id for (memo_id,) in con.execute("SELECT memo_id FROM analyses")}
+    finally:
+        con.close()
+    for atype in ANALYSIS_TYPES:
+        suffix = f"_{atype}.json"
+        with os.scandir(ANALYSIS_DIRS[atype]) as entries:
+            processed.update(
+                entry.name[:-len(suffix)] for entry in entries
+                if entry.name.endswith(suffix) and entry.is_file()
+            )
+    return processed
+
+async def process_all_memos(memo_paths):
+    """Process every memo that doesn't have a corresponding analysis yet"""
+    processed = processed_memo_ids()
+    pending = []
+    for memo_path in sorted(memo_paths):
+        memo_id = memo_path.stem
+        if memo_id in processed:
+            logger.info(f"Skipping {memo_id} (already processed)")
+            continue
+        pending.append(memo_path)
+    
+    if pending:
+        await asyncio.to_thread(warm_up_model)
+    
+    # Keep up to OLLAMA_NUM_PARALLEL memos in flight so the server always has work queued
+    sem = asyncio.Semaphore(OLLAMA_NUM_PARALLEL)
+    
+    async def process_limited(memo_path):
+        async with sem:
+            await process_memo_async(memo_path)
+    
+    await asyncio.gather(*[process_limited(p) for p in pending])
 
 def create_daily_summary(date_str=None):
     """Create a summary of all analyses for a given day"""
     if not date_str:
         date_str = datetime.now().strftime("%Y%m%d")
     
-    print(f"Creating daily summary for {date_str}...")
+    logger.info(f"Creating daily summary for {date_str}...")
     
     # Collect all analyses from the day
     all_data = {
@@ -217,63 +760,120 @@ def create_daily_summary(date_str=None):
         'writing': []
     }
     
-    for analysis_type, dir_path in ANALYSIS_DIRS.items():
-        if analysis_type == 'daily_summaries':
-            continue
-            
-        for file_path in dir_path.glob(f"*{analysis_type}.json"):
+    # One indexed query covers every memo stored in the database
+    con = connect_db()
+    try:
+        rows = con.execute(
+            f"SELECT memo_id, {ANALYSIS_COLUMNS} FROM analyses WHERE date = ?",
+            (date_str,)
+        ).fetchall()
+    finally:
+        con.close()
+    stored = set()
+    for memo_id, *columns in rows:
+        stored.add(memo_id)
+        for analysis_type, data in row_to_analyses(columns).items():
+            all_data[analysis_type].append(data)
+    
+    # Legacy JSON files from before the database (skipping --export copies of stored memos)
+    candidates = []
+    for analysis_type in ANALYSIS_TYPES:
+        suffix = f"_{analysis_type}.json"
+        with os.scandir(ANALYSIS_DIRS[analysis_type]) as entries:
+            for entry in entries:
+                if not entry.name.endswith(suffix) or entry.name[:-len(suffix)] in stored:
+                    continue
+                try:
+                    # Analyses are written when the memo is processed, and copying or
+                    # restoring a file only moves its mtime later, so files last
+                    # modified before the day can be skipped without parsing them
+                    modified = datetime.fromtimestamp(entry.stat().st_mtime).strftime("%Y%m%d")
+                except OSError as e:
+                    logger.error(f"Error reading {entry.path}: {e}")
+                    continue
+                if modified >= date_str:
+                    candidates.append((analysis_type, entry.path, modified))
+    
+    # Submit every read before collecting any, so the small-file I/O overlaps
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        futures = {
+            executor.submit(read_json, path): (analysis_type, path, modified)
+            for analysis_type, path, modified in candidates
+        }
+        for future in as_completed(futures):
+            analysis_type, path, modified = futures[future]
             try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                    # Check if timestamp matches date (rough check)
-                    if date_str in data.get('timestamp', ''):
-                        all_data[analysis_type].append(data)
+                data = future.result()
             except Exception as e:
-                print(f"Error reading {file_path}: {e}")
+                logger.error(f"Error reading {path}: {e}")
+                continue
+            # The recorded timestamp decides the day; the mtime only when there is none
+            timestamp = data.get('timestamp') if isinstance(data, dict) else None
+            day = str(timestamp)[:10].replace('-', '') if timestamp else modified
+            if day == date_str:
+                all_data[analysis_type].append(data)
+    
+    for analysis_type in ANALYSIS_TYPES:
+        all_data[analysis_type].sort(key=lambda data: str(data.get('memo_id', '')))
     
     # Save daily summary
     summary_file = ANALYSIS_DIRS['daily'] / f"summary_{date_str}.json"
-    with open(summary_file, 'w') as f:
-        json.dump(all_data, f, indent=2)
+    write_json(summary_file, all_data)
     
-    print(f"Daily summary saved to {summary_file}")
+    logger.info(f"Daily summary saved to {summary_file}")
 
 def main():
-    global MODEL_NAME
+    global MODEL_NAME, USE_CACHE, MAX_TRANSCRIPT_CHARS, DEDUP, EXPORT_JSON
     
     parser = argparse.ArgumentParser(description="Process voice memo transcripts")
     parser.add_argument("--memo", help="Process specific memo (e.g., memo_0001)")
     parser.add_argument("--all", action="store_true", help="Process all unprocessed memos")
     parser.add_argument("--daily-summary", help="Create daily summary (YYYYMMDD)")
     parser.add_argument("--model", default=MODEL_NAME, help="Ollama model to use")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached responses and query Ollama again")
+    parser.add_argument("--max-chars", type=int, default=MAX_TRANSCRIPT_CHARS,
+                        help="Clip transcripts longer than this before analysis (0 to disable)")
+    parser.add_argument("--dedup", action="store_true",
+                        help=f"Reuse analyses of near-duplicate memos (needs numpy and {EMBED_MODEL})")
+    parser.add_argument("--export", action="store_true",
+                        help="Also write each analysis as a JSON file in analysis/<type>/")
     
     args = parser.parse_args()
+    if args.max_chars < 0:
+        parser.error("--max-chars must be 0 or more")
     
     MODEL_NAME = args.model
+    USE_CACHE = not args.no_cache
+    MAX_TRANSCRIPT_CHARS = args.max_chars
+    DEDUP = args.dedup
+    EXPORT_JSON = args.export
+    if DEDUP:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            parser.error("--dedup needs numpy (pip install numpy)")
     
-    ensure_directories()
-    
-    if args.daily_summary:
-        create_daily_summary(args.daily_summary)
-    elif args.memo:
-        memo_path = VOICE_MEMOS_DIR / f"{args.memo}.txt"
-        if memo_path.exists():
-            process_memo(memo_path)
+    listener = setup_logging()
+    try:
+        ensure_directories()
+        
+        if args.daily_summary:
+            create_daily_summary(args.daily_summary)
+        elif args.memo:
+            memo_path = VOICE_MEMOS_DIR / f"{args.memo}.txt"
+            if memo_path.exists():
+                warm_up_model()
+                process_memo(memo_path)
+            else:
+                logger.error(f"Memo not found: {memo_path}")
+        elif args.all:
+            # Process all .txt files that don't have corresponding analysis
+            txt_files = list(VOICE_MEMOS_DIR.glob("memo_*.txt"))
+            asyncio.run(process_all_memos(txt_files))
         else:
-            print(f"Memo not found: {memo_path}")
-    elif args.all:
-        # Process all .txt files that don't have corresponding analysis
-        txt_files = list(VOICE_MEMOS_DIR.glob("memo_*.txt"))
-        for txt_file in sorted(txt_files):
-            memo_id = txt_file.stem
-            # Check if already processed (look for any analysis file)
-            if any((ANALYSIS_DIRS[atype] / f"{memo_id}_{atype}.json").exists() 
-                   for atype in ['projects', 'tasks', 'personal', 'writing']):
-                print(f"Skipping {memo_id} (already processed)")
-                continue
-            process_memo(txt_file)
-    else:
-        parser.print_help()
+            parser.print_help()
+    finally:
+        listener.stop()  # Flushes any queued messages
 
 if __name__ == "__main__":
     main()
@@ -22,6 +22,8 @@ if [ "$1" = "--help" ] || [ "$1" = "-h" ]; then
     echo "Environment variables:"
     echo "  OLLAMA_HOST=hostname  # Default: localhost"
     echo "  OLLAMA_PORT=port      # Default: 11434"
+    echo "  OLLAMA_NUM_PARALLEL=n # Memos processed at once by process_memos.py --all (default: 4)."
+    echo "                        # Set the same value on the Ollama server so it serves them in parallel."
     exit 0
 fi
 
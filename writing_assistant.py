@@ -4,66 +4,438 @@ Writing Assistant for Voice Memo Analysis
 Helps develop writing ideas from voice memo transcripts
 """
 
+import asyncio
+import fcntl
+import functools
+import hashlib
+import heapq
 import json
+import os
+import pickle
+import sqlite3
+import tempfile
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 from datetime import datetime
 import argparse
 import re
-from collections import defaultdict
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson  # Optional: much faster JSON parsing and serialization
+except ImportError:
+    orjson = None
 
 OLLAMA_API_BASE = "http://localhost:11434/api"
 MODEL_NAME = "llama3.2:3b"
 VOICE_MEMOS_DIR = Path("/mnt/voice_memos")
 ANALYSIS_DIR = VOICE_MEMOS_DIR / "analysis"
 WRITING_DIR = VOICE_MEMOS_DIR / "writing_projects"
+WRITING_INDEX = ANALYSIS_DIR / "writing" / "_index.jsonl"  # Maintained by process_memos.py
+ANALYSIS_DB = ANALYSIS_DIR / "analyses.db"  # Written by process_memos.py
+ANALYSIS_TYPES = ['projects', 'tasks', 'personal', 'writing']  # Columns of the analyses table; keep in step with process_memos.py
+ANALYSIS_COLUMNS = ", ".join(ANALYSIS_TYPES)
+MEMO_INDEX_FILE = VOICE_MEMOS_DIR / ".memo_index.pkl"  # Transcript word bitsets keyed by path and mtime
+MODEL_CONTEXT_TOKENS = 8192  # Context window requested from Ollama (num_ctx) for prompt + response
+MAIN_TRANSCRIPT_TOKENS = MODEL_CONTEXT_TOKENS // 2  # A prompt's main transcript is clipped to this
+RELATED_CONTEXT_TOKENS = MODEL_CONTEXT_TOKENS // 8  # Shared by the related-memo excerpts
+PROMPT_CACHE_DIR = WRITING_DIR / ".prompt_cache"  # Ollama responses keyed by request hash
+USE_CACHE = True
+
+# Opt-in (--semantic-cache) reuse of responses to near-identical development prompts
+SEMANTIC_CACHE = False
+SEMANTIC_CACHE_FILE = WRITING_DIR / ".semantic_cache.db"  # sqlite; one row per cached response
+SEMANTIC_THRESHOLD = 0.87  # Cosine similarity of prompt embeddings counted as a hit
+SEMANTIC_CACHE_SIZE = 1000  # Least recently used entries are dropped beyond this
+EMBED_MODEL = "nomic-embed-text"
+
+# Opt-in (--semantic-related) related-memo search by transcript embeddings
+SEMANTIC_RELATED = False
+MEMO_EMBEDDINGS_FILE = VOICE_MEMOS_DIR / ".memo_embeddings.npz"  # Keyed by path and mtime
+RELATED_EMBEDDING_THRESHOLD = 0.5  # Minimum cosine similarity for a related memo
+EMBED_CONTEXT_TOKENS = 2048  # Transcripts are clipped to this before embedding
+
+# Shared HTTP session so every Ollama call reuses a kept-alive connection
+SESSION = requests.Session()
+SESSION.headers.update({"Content-Type": "application/json"})
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+def json_loads(data):
+    """Parse JSON from str or bytes, using orjson when it is installed"""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def read_json(path):
+    """Load a JSON file"""
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
+
+def write_json(path, data):
+    """Write data to a JSON file with 2-space indentation"""
+    if orjson:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+def query_analysis_db(sql, params=()):
+    """Run a read-only query on the analysis database; no rows if it doesn't exist yet"""
+    try:
+        con = sqlite3.connect(f"file:{ANALYSIS_DB}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        return []
+    try:
+        return con.execute(sql, params).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        con.close()
+
+def load_analyses(memo_id):
+    """All of a memo's analyses, from the database or else the exported JSON files"""
+    rows = query_analysis_db(
+        f"SELECT {ANALYSIS_COLUMNS} FROM analyses WHERE memo_id = ?", (memo_id,)
+    )
+    if rows:
+        return {atype: json_loads(blob) for atype, blob in zip(ANALYSIS_TYPES, rows[0]) if blob}
+    
+    analyses = {}
+    for atype in ANALYSIS_TYPES:
+        try:
+            analyses[atype] = read_json((ANALYSIS_DIR / atype) / f"{memo_id}_{atype}.json")
+        except FileNotFoundError:
+            continue
+    return analyses
+
+def load_analysis(memo_id, analysis_type):
+    """One analysis of a memo; raises FileNotFoundError if it was never produced"""
+    data = load_analyses(memo_id).get(analysis_type)
+    if data is None:
+        raise FileNotFoundError(f"No {analysis_type} analysis for {memo_id}")
+    return data
 
 def ensure_writing_dir():
     """Create writing projects directory"""
     WRITING_DIR.mkdir(exist_ok=True)
+    PROMPT_CACHE_DIR.mkdir(exist_ok=True)
+
+def cache_key(request):
+    """Hash everything in a generate request that affects the model's output"""
+    payload = json.dumps(request, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def read_cached_response(key):
+    """Return a previously stored response, or None on a miss"""
+    try:
+        return (PROMPT_CACHE_DIR / f"{key}.txt").read_text()
+    except FileNotFoundError:
+        return None
 
-def call_ollama(prompt, model=MODEL_NAME):
-    """Call Ollama API"""
+def write_cached_response(key, response):
+    """Store a response atomically so concurrent writers never leave partial files"""
     try:
-        response = requests.post(
-            f"{OLLAMA_API_BASE}/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,  # Higher creativity for writing
-                    "top_p": 0.9
-                }
-            },
+        with tempfile.NamedTemporaryFile('w', dir=PROMPT_CACHE_DIR, suffix=".tmp", delete=False) as f:
+            f.write(response)
+        os.replace(f.name, PROMPT_CACHE_DIR / f"{key}.txt")
+    except Exception as e:
+        print(f"Warning: could not cache response: {e}")
+
+def ollama_request(endpoint, request, stream=False):
+    """POST a generate or chat request, reusing the stored response to an identical one
+
+    With stream=True the response is printed to the terminal as it is generated.
+    """
+    key = cache_key(request)
+    if USE_CACHE:
+        cached = read_cached_response(key)
+        if cached is not None:
+            if stream:
+                print(cached)
+            return cached
+    
+    try:
+        response = SESSION.post(
+            f"{OLLAMA_API_BASE}/{endpoint}",
+            json={**request, "stream": stream},
+            stream=stream,
             timeout=300
         )
-        response.raise_for_status()
-        return response.json()["response"]
+        # Closing the response hands its kept-alive connection back to SESSION's
+        # pool, even when an error status or a failed stream cuts the read short
+        with response:
+            response.raise_for_status()
+            if stream:
+                text, done = print_stream(response)
+            else:
+                data = response.json()
+                text = data["message"]["content"] if endpoint == "chat" else data["response"]
+                done = True
     except Exception as e:
         print(f"Error calling Ollama API: {e}")
         return None
+    
+    if done:  # A stream that dropped before the end is used, but not cached
+        write_cached_response(key, text)
+    return text
+
+def writing_options(max_tokens):
+    """Sampling options shared by every writing assistant request"""
+    return {
+        "temperature": 0.7,  # Higher creativity for writing
+        "top_p": 0.9,
+        "num_predict": max_tokens,
+        "num_ctx": MODEL_CONTEXT_TOKENS  # Ollama's default window is smaller than the prompts are budgeted for
+    }
+
+def call_ollama(prompt, model=None, max_tokens=1024, stream=False):
+    """Call Ollama's generate API with a single prompt"""
+    return ollama_request("generate", {
+        "model": model or MODEL_NAME,
+        "prompt": prompt,
+        "options": writing_options(max_tokens)
+    }, stream)
+
+def chat_ollama(messages, model=None, max_tokens=1024, stream=False):
+    """Call Ollama's chat API; a fixed system message lets the server reuse its cached prefix"""
+    return ollama_request("chat", {
+        "model": model or MODEL_NAME,
+        "messages": messages,
+        "options": writing_options(max_tokens)
+    }, stream)
+
+def print_stream(response):
+    """Print a streamed generate or chat response as it arrives; returns the text and
+    whether the server marked it done"""
+    parts = []
+    done = False
+    for line in response.iter_lines():
+        if not line:
+            continue
+        chunk = json_loads(line)
+        if "error" in chunk:
+            print()
+            raise RuntimeError(chunk["error"])
+        piece = chunk.get("response") or chunk.get("message", {}).get("content", "")
+        print(piece, end="", flush=True)
+        parts.append(piece)
+        if chunk.get("done"):
+            done = True
+            break
+    print()
+    return "".join(parts), done
+
+async def call_ollama_async(prompt, model=None, max_tokens=1024):
+    """Run call_ollama on a worker thread so independent prompts can be in flight together"""
+    return await asyncio.to_thread(call_ollama, prompt, model, max_tokens)
+
+async def gather_ollama(prompts, max_tokens=1024):
+    """Send independent prompts concurrently; Ollama serves up to OLLAMA_NUM_PARALLEL at once"""
+    return await asyncio.gather(*[call_ollama_async(p, max_tokens=max_tokens) for p in prompts])
+
+_semantic_cache = None  # OrderedDict of (model, prompt) -> (embedding, response), loaded on first use
+
+def embed_text(text):
+    """Embed text with Ollama's embeddings endpoint"""
+    response = SESSION.post(
+        f"{OLLAMA_API_BASE}/embeddings",
+        json={"model": EMBED_MODEL, "prompt": text},
+        timeout=300
+    )
+    response.raise_for_status()
+    return response.json()["embedding"]
+
+def semantic_cache_db():
+    """Open the semantic cache database, creating its table on first use"""
+    con = sqlite3.connect(SEMANTIC_CACHE_FILE)
+    con.execute("""CREATE TABLE IF NOT EXISTS semantic_cache (
+        model TEXT NOT NULL,
+        prompt TEXT NOT NULL,
+        response TEXT NOT NULL,
+        embedding BLOB NOT NULL,
+        last_used REAL NOT NULL,
+        PRIMARY KEY (model, prompt)
+    )""")
+    return con
+
+def load_semantic_cache():
+    """Load the semantic cache from disk, least recently used entry first"""
+    global _semantic_cache
+    import numpy as np
+    if _semantic_cache is None:
+        _semantic_cache = OrderedDict()
+        try:
+            con = semantic_cache_db()
+            try:
+                rows = con.execute(
+                    "SELECT model, prompt, response, embedding FROM semantic_cache ORDER BY last_used"
+                ).fetchall()
+            finally:
+                con.close()
+            for model, prompt, response, embedding in rows:
+                _semantic_cache[(model, prompt)] = (np.frombuffer(embedding, dtype=np.float32), response)
+        except sqlite3.Error as e:
+            print(f"Warning: ignoring unreadable semantic cache: {e}")
+    return _semantic_cache
+
+def update_semantic_cache(key, entry=None, evicted=()):
+    """Mark an entry as just used, inserting it if given, and delete evicted keys;
+    only the touched rows are written"""
+    try:
+        con = semantic_cache_db()
+        try:
+            with con:
+                now = datetime.now().timestamp()
+                if entry is None:
+                    con.execute(
+                        "UPDATE semantic_cache SET last_used = ? WHERE model = ? AND prompt = ?",
+                        (now, *key)
+                    )
+                else:
+                    embedding, response = entry
+                    con.execute(
+                        "INSERT OR REPLACE INTO semantic_cache VALUES (?, ?, ?, ?, ?)",
+                        (*key, response, embedding.astype('float32').tobytes(), now)
+                    )
+                con.executemany(
+                    "DELETE FROM semantic_cache WHERE model = ? AND prompt = ?", list(evicted)
+                )
+        finally:
+            con.close()
+    except sqlite3.Error as e:
+        print(f"Warning: could not save semantic cache: {e}")
+
+def cached_call_ollama(prompt, model=None, max_tokens=1024, stream=False):
+    """call_ollama, answering from the semantic cache when a similar prompt was seen before
+
+    Only for standalone prompts: successive interview turns embed almost the same
+    text, so a near match there would repeat the previous turn's reply.
+    """
+    if not SEMANTIC_CACHE:
+        return call_ollama(prompt, model, max_tokens, stream)
+    
+    import numpy as np
+    model = model or MODEL_NAME
+    try:
+        embedding = np.asarray(embed_text(prompt), dtype=np.float32)
+    except Exception as e:
+        print(f"Warning: semantic cache unavailable: {e}")
+        return call_ollama(prompt, model, max_tokens, stream)
+    
+    cache = load_semantic_cache()
+    keys = [key for key, (vector, _) in cache.items()
+            if key[0] == model and vector.shape == embedding.shape]
+    if keys and USE_CACHE:  # --no-cache skips the lookup but still stores the new response
+        matrix = np.stack([cache[key][0] for key in keys])
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding)
+        sims = matrix @ embedding / np.maximum(norms, 1e-12)
+        best = int(sims.argmax())
+        if sims[best] >= SEMANTIC_THRESHOLD:
+            cache.move_to_end(keys[best])
+            update_semantic_cache(keys[best])
+            if stream:
+                print(cache[keys[best]][1])
+            return cache[keys[best]][1]
+    
+    response = call_ollama(prompt, model, max_tokens, stream)
+    if response:
+        key = (model, prompt)
+        cache[key] = (embedding, response)
+        cache.move_to_end(key)
+        evicted = []
+        while len(cache) > SEMANTIC_CACHE_SIZE:
+            evicted.append(cache.popitem(last=False)[0])
+        update_semantic_cache(key, cache[key], evicted)
+    return response
+
+def rebuild_writing_index():
+    """Regenerate the writing ideas index from the analysis database and legacy files;
+    returns whether an index was written"""
+    analyses = [
+        (memo_id, json_loads(blob))
+        for memo_id, blob in query_analysis_db("SELECT memo_id, writing FROM analyses WHERE writing IS NOT NULL")
+    ]
+    writing_dir = WRITING_INDEX.parent
+    if not analyses and not writing_dir.is_dir():
+        print(f"Nothing to index: {writing_dir} doesn't exist yet")
+        return False
+    
+    stored = {memo_id for memo_id, _ in analyses}
+    legacy = []
+    if writing_dir.is_dir():
+        with os.scandir(writing_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith("_writing.json"):
+                    continue
+                memo_id = entry.name[:-len("_writing.json")]
+                if memo_id not in stored:  # Otherwise an --export copy of a stored analysis
+                    legacy.append((memo_id, entry.path))
+    
+    # Legacy files are read in parallel
+    results = asyncio.run(gather_in_threads(*[(read_json, path) for _, path in legacy]))
+    for (memo_id, path), data in zip(legacy, results):
+        if isinstance(data, Exception):
+            print(f"Error reading {path}: {data}")
+        else:
+            analyses.append((memo_id, data))
+    
+    lines = []
+    for memo_id, data in sorted(analyses, key=lambda item: item[0]):
+        for idea in data.get('writing_ideas') or [None]:
+            lines.append(json.dumps({
+                'memo_id': data.get('memo_id', memo_id),
+                'idea': idea,
+                'timestamp': data.get('timestamp', '')
+            }) + "\n")
+    
+    # Rewrite in place under the same lock process_memos.py takes to append
+    try:
+        writing_dir.mkdir(parents=True, exist_ok=True)
+        with open(WRITING_INDEX, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.truncate(0)
+            f.writelines(lines)
+    except OSError as e:
+        print(f"Could not write {WRITING_INDEX}: {e}")
+        return False
+    
+    print(f"Indexed {len(analyses)} writing analyses in {WRITING_INDEX}")
+    return True
 
 def list_writing_ideas():
-    """List all writing ideas from analysis files"""
-    writing_files = list((ANALYSIS_DIR / "writing").glob("*_writing.json"))
+    """List all writing ideas from the writing ideas index"""
+    if not WRITING_INDEX.exists() and not rebuild_writing_index():
+        print("No writing ideas found. Run the main processor first.")
+        return
+    
+    # A memo that was processed again has newer lines with a new timestamp;
+    # only its latest batch of ideas counts
+    latest = {}
+    with open(WRITING_INDEX, 'rb') as f:
+        for line in f:
+            try:
+                record = json_loads(line)
+            except ValueError:
+                continue  # Skip a partially written line
+            timestamp = record.get('timestamp', '')
+            entry = latest.get(record['memo_id'])
+            if entry is None or entry['timestamp'] != timestamp:
+                entry = latest[record['memo_id']] = {'timestamp': timestamp, 'ideas': []}
+            if record.get('idea') is not None:
+                entry['ideas'].append(record['idea'])
     
     all_ideas = []
-    for file_path in sorted(writing_files):
-        try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                memo_id = data.get('memo_id', file_path.stem.split('_')[0])
-                
-                if data.get('writing_ideas'):
-                    for idea in data['writing_ideas']:
-                        all_ideas.append({
-                            'memo_id': memo_id,
-                            'idea': idea,
-                            'timestamp': data.get('timestamp', '')
-                        })
-        except Exception as e:
-            print(f"Error reading {file_path}: {e}")
+    for memo_id in sorted(latest):
+        for idea in latest[memo_id]['ideas']:
+            all_ideas.append({
+                'memo_id': memo_id,
+                'idea': idea,
+                'timestamp': latest[memo_id]['timestamp']
+            })
     
     if not all_ideas:
         print("No writing ideas found. Run the main processor first.")
@@ -71,44 +443,65 @@ def list_writing_ideas():
     
     print(f"\nFound {len(all_ideas)} writing ideas:\n")
     for i, item in enumerate(all_ideas, 1):
-        print(f"{i:2d}. [{item['memo_id']}] {item['idea'][:100]}...")
+        print(f"{i:2d}. [{item['memo_id']}] {str(item['idea'])[:100]}...")  # Older analyses may hold objects
     
     return all_ideas
 
+async def gather_in_threads(*calls):
+    """Run blocking (function, *args) calls on worker threads; returns results or raised exceptions"""
+    return await asyncio.gather(
+        *[asyncio.to_thread(func, *args) for func, *args in calls],
+        return_exceptions=True
+    )
+
+def read_memo_files(memo_id):
+    """Read a memo's transcript and writing analysis"""
+    transcript = (VOICE_MEMOS_DIR / f"{memo_id}.txt").read_text()
+    writing_data = load_analysis(memo_id, 'writing')
+    return transcript, writing_data
+
 def develop_writing_idea(memo_id, original_transcript=None):
     """Develop a specific writing idea with follow-up questions"""
     
-    # Get the original transcript
+    transcript_file = VOICE_MEMOS_DIR / f"{memo_id}.txt"
+    
+    # Read the writing analysis and (if not given) the original transcript together
+    reads = [(load_analysis, memo_id, 'writing')]
     if not original_transcript:
-        transcript_file = VOICE_MEMOS_DIR / f"{memo_id}.txt"
-        try:
-            with open(transcript_file, 'r') as f:
-                original_transcript = f.read()
-        except FileNotFoundError:
+        reads.append((transcript_file.read_text,))
+    writing_data, *transcript = asyncio.run(gather_in_threads(*reads))
+    
+    if transcript:
+        original_transcript = transcript[0]
+        if isinstance(original_transcript, FileNotFoundError):
             print(f"Transcript file not found: {transcript_file}")
             return
+        if isinstance(original_transcript, Exception):
+            raise original_transcript
     
-    # Get the writing analysis
-    writing_file = (ANALYSIS_DIR / "writing") / f"{memo_id}_writing.json"
-    try:
-        with open(writing_file, 'r') as f:
-            writing_data = json.load(f)
-    except FileNotFoundError:
+    if isinstance(writing_data, FileNotFoundError):
         print(f"Writing analysis not found for {memo_id}")
         return
+    if isinstance(writing_data, Exception):
+        raise writing_data
     
     print(f"\nDeveloping writing ideas from {memo_id}...\n")
     
-    # Create development prompt
+    # Create development prompt; the extracted elements share what the transcript leaves
+    original_transcript = clip_to_tokens(original_transcript, MAIN_TRANSCRIPT_TOKENS)
+    ideas, drafts, phrases = pack_context(
+        [str(writing_data.get(key, [])) for key in ('writing_ideas', 'rough_drafts', 'quotes_phrases')],
+        prompt_budget(original_transcript, reply_tokens=2048)
+    )
     prompt = f"""You are helping a writer develop ideas from their voice memo. 
 
 Original transcript:
 {original_transcript}
 
 Extracted writing elements:
-- Ideas: {writing_data.get('writing_ideas', [])}
-- Rough drafts: {writing_data.get('rough_drafts', [])}
-- Notable phrases: {writing_data.get('quotes_phrases', [])}
+- Ideas: {ideas}
+- Rough drafts: {drafts}
+- Notable phrases: {phrases}
 
 Please help develop these ideas by:
 
@@ -122,7 +515,7 @@ Be specific and actionable. Focus on turning voice memo fragments into developed
 
 Response:"""
     
-    response = call_ollama(prompt)
+    response = cached_call_ollama(prompt, max_tokens=2048)  # Long-form output
     if response:
         # Save the development
         output_file = WRITING_DIR / f"{memo_id}_development.md"
@@ -139,67 +532,87 @@ Response:"""
     else:
         print("Failed to generate development")
 
+DIGEST_TEMPLATE = """Summarize this voice memo transcript for a writer who will combine it with other memos into one draft.
+List its main ideas, any stories or examples, and a few phrases worth keeping in the speaker's own words.
+
+Transcript:
+{transcript}
+
+Digest:"""
+
+DRAFT_INSTRUCTIONS = """You are helping a writer create a rough draft from their voice memo content.
+Each of the following messages is one memo. When asked for the draft, create a coherent rough draft that:
+1. Identifies the main theme or story emerging from this content
+2. Structures the ideas into a logical flow
+3. Develops the most promising concepts
+4. Maintains the authentic voice from the original memos
+5. Suggests areas that need more development
+
+This should be a working draft that the writer can build upon, not a polished piece."""
+
 def create_writing_draft(memo_ids):
     """Create a rough draft from multiple related memos"""
     if isinstance(memo_ids, str):
         memo_ids = [memo_ids]
     
-    # Collect transcripts and analyses
+    # Collect transcripts and analyses, reading all memos concurrently
+    results = asyncio.run(gather_in_threads(*[(read_memo_files, memo_id) for memo_id in memo_ids]))
     all_content = []
-    for memo_id in memo_ids:
-        transcript_file = VOICE_MEMOS_DIR / f"{memo_id}.txt"
-        writing_file = (ANALYSIS_DIR / "writing") / f"{memo_id}_writing.json"
+    for memo_id, result in zip(memo_ids, results):
+        if isinstance(result, FileNotFoundError):
+            print(f"Warning: Could not find files for {memo_id}: {result}")
+            continue
+        if isinstance(result, Exception):
+            raise result
         
-        try:
-            with open(transcript_file, 'r') as f:
-                transcript = f.read()
-            with open(writing_file, 'r') as f:
-                writing_data = json.load(f)
-            
-            all_content.append({
-                'memo_id': memo_id,
-                'transcript': transcript,
-                'writing_data': writing_data
-            })
-        except FileNotFoundError as e:
-            print(f"Warning: Could not find files for {memo_id}: {e}")
+        transcript, writing_data = result
+        all_content.append({
+            'memo_id': memo_id,
+            'transcript': transcript,
+            'writing_data': writing_data
+        })
     
     if not all_content:
         print("No content found for draft creation")
         return
     
-    # Create draft prompt
-    content_summary = ""
-    for item in all_content:
-        content_summary += f"\nMemo {item['memo_id']}:\n"
-        content_summary += f"Transcript: {item['transcript'][:300]}...\n"
-        content_summary += f"Ideas: {item['writing_data'].get('writing_ideas', [])}\n"
+    # With several memos, digest each full transcript first (all at once), so the
+    # draft prompt sees every memo's substance rather than its first 300 characters
+    if len(all_content) > 1:
+        print(f"Digesting {len(all_content)} memos...")
+        digests = asyncio.run(gather_ollama(
+            [DIGEST_TEMPLATE.format(transcript=clip_to_tokens(item['transcript'], MAIN_TRANSCRIPT_TOKENS))
+             for item in all_content],
+            max_tokens=512
+        ))
+        for item, digest in zip(all_content, digests):
+            item['digest'] = digest
     
-    prompt = f"""You are helping a writer create a rough draft from their voice memo content.
-
-Source material:
-{content_summary}
-
-Please create a coherent rough draft that:
-1. Identifies the main theme or story emerging from this content
-2. Structures the ideas into a logical flow
-3. Develops the most promising concepts
-4. Maintains the authentic voice from the original memos
-5. Suggests areas that need more development
-
-This should be a working draft that the writer can build upon, not a polished piece.
-
-Draft:"""
+    # One user message per memo after a fixed system message, then the request itself;
+    # the memos share whatever the instructions and the reply leave of the window
+    contents = []
+    for item in all_content:
+        if item.get('digest'):
+            source = f"Digest:\n{item['digest'].strip()}"
+        else:
+            source = f"Transcript:\n{clip_to_tokens(item['transcript'].strip(), MAIN_TRANSCRIPT_TOKENS)}"
+        contents.append(f"Memo {item['memo_id']}:\n{source}\n\nIdeas: {item['writing_data'].get('writing_ideas', [])}")
+    budget = prompt_budget(DRAFT_INSTRUCTIONS, reply_tokens=2048) - 16 * len(contents)  # - message framing
+    messages = [{"role": "system", "content": DRAFT_INSTRUCTIONS}]
+    for content in pack_context(contents, budget):
+        messages.append({"role": "user", "content": content})
+    messages.append({"role": "user", "content": "Now produce the draft."})
     
-    response = call_ollama(prompt)
+    response = chat_ollama(messages, max_tokens=2048)  # Long-form output
     if response:
-        # Save draft
-        draft_name = f"draft_{'_'.join(memo_ids)}_{datetime.now().strftime('%Y%m%d')}"
+        # Save draft (one clock reading for the file name and header)
+        now = datetime.now()
+        draft_name = f"draft_{'_'.join(memo_ids)}_{now.strftime('%Y%m%d')}"
         output_file = WRITING_DIR / f"{draft_name}.md"
         
         with open(output_file, 'w') as f:
             f.write(f"# Draft from Memos: {', '.join(memo_ids)}\n\n")
-            f.write(f"**Created:** {datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
+            f.write(f"**Created:** {now.strftime('%Y-%m-%d %H:%M')}\n")
             f.write(f"**Source memos:** {', '.join(memo_ids)}\n\n")
             f.write(response)
         
@@ -208,8 +621,13 @@ Draft:"""
     else:
         print("Failed to generate draft")
 
+@functools.lru_cache(maxsize=256)
 def load_memo_context(memo_id):
-    """Load full context for a memo including transcript and all analyses"""
+    """Load full context for a memo including transcript and all analyses
+
+    Results are cached per process and shared between callers, so treat the
+    returned dict as read-only (load_memo_context.cache_clear() drops the cache).
+    """
     context = {
         'memo_id': memo_id,
         'transcript': '',
@@ -226,60 +644,241 @@ def load_memo_context(memo_id):
         return None
     
     # Load all analyses
-    analysis_types = ['writing', 'projects', 'tasks', 'personal']
-    for analysis_type in analysis_types:
-        analysis_file = (ANALYSIS_DIR / analysis_type) / f"{memo_id}_{analysis_type}.json"
-        try:
-            with open(analysis_file, 'r') as f:
-                context['analyses'][analysis_type] = json.load(f)
-        except FileNotFoundError:
-            context['analyses'][analysis_type] = {}
+    analyses = load_analyses(memo_id)
+    for analysis_type in ['writing', 'projects', 'tasks', 'personal']:
+        context['analyses'][analysis_type] = analyses.get(analysis_type, {})
     
     return context
 
-def find_related_memos(memo_id, max_related=3):
-    """Find related memos using simple text similarity"""
-    target_context = load_memo_context(memo_id)
-    if not target_context:
-        return []
+_memo_entries = None  # path -> {'mtime', 'size', 'mask'}, loaded on first use
+_vocabulary = None  # word -> its bit in the masks; only ever appended to, so stored masks stay valid
+_memo_index = None  # memo_id -> entry
+_WORD_RE = re.compile(r'\b\w{4,}\b')  # Words 4+ chars
+
+if hasattr(int, "bit_count"):  # Python 3.10+
+    popcount = int.bit_count
+else:
+    def popcount(mask):
+        """Number of set bits"""
+        return bin(mask).count("1")
+
+def memo_words(text):
+    """The set of 4+ character words in a transcript"""
+    return frozenset(_WORD_RE.findall(text.lower()))
+
+def word_mask(words, extend=True):
+    """Bitset of a word set over the shared vocabulary, giving new words the next free bits"""
+    bits = []
+    for word in words:
+        bit = _vocabulary.get(word)
+        if bit is None:
+            if not extend:
+                continue  # A word no indexed memo has can't be in an intersection
+            bit = _vocabulary[word] = len(_vocabulary)
+        bits.append(bit)
     
-    target_text = target_context['transcript'].lower()
-    target_words = set(re.findall(r'\b\w{4,}\b', target_text))  # Words 4+ chars
+    mask = bytearray((len(_vocabulary) + 7) // 8)
+    for bit in bits:
+        mask[bit >> 3] |= 1 << (bit & 7)
+    return int.from_bytes(mask, 'little')
+
+def save_memo_index():
+    """Persist the memo index atomically"""
+    try:
+        with tempfile.NamedTemporaryFile(dir=VOICE_MEMOS_DIR, suffix=".tmp", delete=False) as f:
+            pickle.dump({'vocabulary': _vocabulary, 'entries': _memo_entries}, f)
+        os.replace(f.name, MEMO_INDEX_FILE)
+    except Exception as e:
+        print(f"Warning: could not save memo index: {e}")
+
+def memo_index():
+    """Word bitsets and counts of every transcript, re-reading only files changed since the last run"""
+    global _memo_entries, _vocabulary, _memo_index
+    if _memo_index is not None:
+        return _memo_index
     
-    related_scores = []
+    try:
+        with open(MEMO_INDEX_FILE, 'rb') as f:
+            stored = pickle.load(f)
+        _vocabulary, cached = stored['vocabulary'], stored['entries']
+    except FileNotFoundError:
+        _vocabulary, cached = {}, {}
+    except Exception as e:
+        print(f"Warning: rebuilding unreadable memo index: {e}")
+        _vocabulary, cached = {}, {}
     
-    # Get all memo files
-    memo_files = list(VOICE_MEMOS_DIR.glob("memo_*.txt"))
+    _memo_entries = {}
+    stale = []
+    with os.scandir(VOICE_MEMOS_DIR) as entries:
+        for entry in entries:
+            if not (entry.name.startswith("memo_") and entry.name.endswith(".txt")):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            hit = cached.get(entry.path)
+            if hit and hit['mtime'] == mtime:
+                _memo_entries[entry.path] = hit
+            else:
+                stale.append((entry.path, mtime))
     
-    for memo_file in memo_files:
-        other_memo_id = memo_file.stem
-        if other_memo_id == memo_id:
-            continue
-            
+    # Read every new or changed transcript at once, so the small reads overlap
+    texts = asyncio.run(gather_in_threads(*[(Path(path).read_text,) for path, _ in stale]))
+    for (path, mtime), text in zip(stale, texts):
+        if isinstance(text, Exception):
+            continue  # Unreadable or not UTF-8; skipped like before the index existed
+        words = memo_words(text)
+        # Only the bitset is kept; the words themselves can be recovered from the vocabulary
+        _memo_entries[path] = {
+            'mtime': mtime, 'size': len(words), 'mask': word_mask(words)
+        }
+    
+    if stale or len(_memo_entries) != len(cached):
+        save_memo_index()
+    
+    _memo_index = {Path(path).stem: entry for path, entry in _memo_entries.items()}
+    return _memo_index
+
+def memo_embeddings():
+    """Memo ids and unit-length transcript embeddings, embedding only new or changed files"""
+    import numpy as np
+    try:
+        with np.load(MEMO_EMBEDDINGS_FILE) as data:
+            cached = {
+                str(path): (float(mtime), vector)
+                for path, mtime, vector in zip(data['paths'], data['mtimes'], data['embeddings'])
+            }
+    except FileNotFoundError:
+        cached = {}
+    except Exception as e:
+        print(f"Warning: rebuilding unreadable memo embeddings: {e}")
+        cached = {}
+    
+    current = {}
+    with os.scandir(VOICE_MEMOS_DIR) as entries:
+        for entry in entries:
+            if entry.name.startswith("memo_") and entry.name.endswith(".txt"):
+                try:
+                    current[entry.path] = entry.stat().st_mtime
+                except OSError:
+                    continue
+    
+    def embed_file(path):
+        """A transcript's embedding, None for an empty one, or the exception that stopped it"""
         try:
-            with open(memo_file, 'r') as f:
-                other_text = f.read().lower()
-            
-            other_words = set(re.findall(r'\b\w{4,}\b', other_text))
-            
-            # Simple Jaccard similarity
-            if len(target_words) > 0 and len(other_words) > 0:
-                intersection = len(target_words & other_words)
-                union = len(target_words | other_words)
-                similarity = intersection / union if union > 0 else 0
-                
-                if similarity > 0.1:  # Minimum threshold
-                    related_scores.append({
-                        'memo_id': other_memo_id,
-                        'similarity': similarity,
-                        'context': load_memo_context(other_memo_id)
-                    })
+            with open(path, 'r') as f:
+                text = clip_to_tokens(f.read().strip(), EMBED_CONTEXT_TOKENS)
+            return np.asarray(embed_text(text), dtype=np.float32) if text else None
         except Exception as e:
+            return e
+    
+    stale = [path for path, mtime in current.items() if path not in cached or cached[path][0] != mtime]
+    if stale:
+        print(f"Embedding {len(stale)} memos...")
+        failures = []
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for path, vector in zip(stale, executor.map(embed_file, stale)):
+                if isinstance(vector, Exception):
+                    failures.append((path, vector))
+                    cached.pop(path, None)  # Retried on the next run
+                elif vector is not None:
+                    cached[path] = (current[path], vector)
+        if failures:
+            path, error = failures[0]
+            print(f"Warning: could not embed {len(failures)} memos (first, {Path(path).name}: {error})")
+    
+    # Drop deleted memos, and vectors from a different embedding model's dimension
+    dims = {cached[path][1].shape for path in stale if path in cached}
+    entries = {
+        path: value for path, value in cached.items()
+        if path in current and (not dims or value[1].shape in dims)
+    }
+    if stale or len(entries) != len(cached):
+        paths = sorted(entries)
+        with tempfile.NamedTemporaryFile(dir=VOICE_MEMOS_DIR, suffix=".npz", delete=False) as f:
+            np.savez(
+                f,
+                paths=np.array(paths),
+                mtimes=np.array([entries[path][0] for path in paths]),
+                embeddings=np.array([entries[path][1] for path in paths], dtype=np.float32)
+            )
+        os.replace(f.name, MEMO_EMBEDDINGS_FILE)
+    
+    memo_ids = [Path(path).stem for path in entries]
+    if not memo_ids:
+        return memo_ids, None
+    matrix = np.array([vector for _, vector in entries.values()], dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return memo_ids, matrix
+
+def related_by_embedding(memo_id, max_related):
+    """Top related memos by embedding cosine similarity, or None if the memo isn't embedded"""
+    import numpy as np
+    memo_ids, matrix = memo_embeddings()
+    if memo_id not in memo_ids:
+        return None
+    
+    target = memo_ids.index(memo_id)
+    sims = matrix @ matrix[target]
+    sims[target] = -np.inf
+    top = np.argsort(-sims)[:max_related]
+    return [
+        {'memo_id': memo_ids[i], 'similarity': float(sims[i])}
+        for i in top if sims[i] >= RELATED_EMBEDDING_THRESHOLD
+    ]
+
+def find_related_memos(memo_id, max_related=3):
+    """Find related memos using simple text similarity"""
+    if SEMANTIC_RELATED:
+        try:
+            related = related_by_embedding(memo_id, max_related)
+        except Exception as e:
+            print(f"Warning: falling back to word overlap for related memos: {e}")
+            related = None
+        if related is not None:
+            for item in related:
+                item['context'] = load_memo_context(item['memo_id'])
+            return related
+    
+    index = memo_index()
+    if memo_id in index:
+        target_size, target_mask = index[memo_id]['size'], index[memo_id]['mask']
+    else:
+        target_context = load_memo_context(memo_id)
+        if not target_context:
+            return []
+        target_words = memo_words(target_context['transcript'])
+        target_size, target_mask = len(target_words), word_mask(target_words, extend=False)
+    
+    if not target_size:
+        return []
+    
+    # Every memo is scored exactly: one AND and popcount of fixed bitsets per memo is
+    # already as cheap as a Bloom-filter pass would be, and has no false positives.
+    # Plain (similarity, memo_id) tuples and locals in the hot loop; the result
+    # dicts are only built for the winners
+    scores = []
+    min_size = 0.1 * target_size  # Jaccard can't exceed the ratio of the set sizes,
+    max_size = 10 * target_size   # so memos outside these bounds are skipped uncompared
+    for other_memo_id, other in index.items():
+        other_size = other['size']
+        if not min_size < other_size < max_size or other_memo_id == memo_id:
             continue
+        
+        # Jaccard similarity: the intersection is a popcount of the ANDed bitsets,
+        # and the union size follows from it
+        intersection = popcount(target_mask & other['mask'])
+        similarity = intersection / (target_size + other_size - intersection)
+        if similarity > 0.1:  # Minimum threshold
+            scores.append((similarity, other_memo_id))
     
-    # Sort by similarity and return top results
-    related_scores.sort(key=lambda x: x['similarity'], reverse=True)
-    return related_scores[:max_related]
+    # Keep the top results without sorting every candidate, then load only their full context
+    top = heapq.nlargest(max_related, scores, key=lambda score: score[0])
+    related = [{'memo_id': other_memo_id, 'similarity': similarity} for similarity, other_memo_id in top]
+    for item in related:
+        item['context'] = load_memo_context(item['memo_id'])
+    return related
 
 def build_interview_context(memo_id):
     """Build rich context for interactive interview"""
@@ -288,12 +887,14 @@ def build_interview_context(memo_id):
         return None
     
     related_memos = find_related_memos(memo_id)
+    writing = main_context['analyses'].get('writing', {})
     
     context = {
         'main_memo': main_context,
         'related_memos': related_memos,
-        'writing_ideas': main_context['analyses'].get('writing', {}).get('WRITING_IDEAS', []),
-        'initial_questions': main_context['analyses'].get('writing', {}).get('INTERVIEW_QUESTIONS', []),
+        # Older analyses may still use the uppercase keys from the prompt
+        'writing_ideas': writing.get('writing_ideas', writing.get('WRITING_IDEAS', [])),
+        'initial_questions': writing.get('interview_questions', writing.get('INTERVIEW_QUESTIONS', [])),
         'projects': main_context['analyses'].get('projects', {}),
         'tasks': main_context['analyses'].get('tasks', {}),
         'personal_insights': main_context['analyses'].get('personal', {})
@@ -301,6 +902,59 @@ def build_interview_context(memo_id):
     
     return context
 
+def estimate_tokens(text):
+    """Rough token count: about 4 characters per token for ASCII, one per other character"""
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return (ascii_chars + 3) // 4 + len(text) - ascii_chars
+
+def clip_to_tokens(text, budget):
+    """Cut text to fit a token budget, marking the cut with an ellipsis"""
+    if estimate_tokens(text) <= budget:
+        return text
+    lo, hi = 0, len(text)  # Longest prefix that leaves a token for the ellipsis
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) < budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + "…"
+
+def pack_context(items, budget_tokens):
+    """Fit texts into a shared token budget; short ones stay whole and leave their
+    unused share to the rest, long ones are clipped to an even share"""
+    sizes = [estimate_tokens(item) for item in items]
+    allocation = [0] * len(items)
+    remaining = budget_tokens
+    for n, i in enumerate(sorted(range(len(items)), key=sizes.__getitem__)):
+        allocation[i] = min(sizes[i], remaining // (len(items) - n))
+        remaining -= allocation[i]
+    return [clip_to_tokens(item, tokens) for item, tokens in zip(items, allocation)]
+
+def prompt_budget(*fixed_texts, reply_tokens=1024):
+    """Tokens left for variable content once fixed prompt parts and the reply are accounted for"""
+    used = sum(estimate_tokens(text) for text in fixed_texts) + 256  # + instructions
+    return max(MODEL_CONTEXT_TOKENS - reply_tokens - used, 256)
+
+FOLLOWUP_INSTRUCTIONS = """You are an AI writing coach having a conversation with a writer about their voice memo ideas.
+
+ORIGINAL MEMO TRANSCRIPT:
+{transcript}
+
+AVAILABLE CONTEXT:
+- Writing ideas: {writing_ideas}
+- Related memos: {related_memos}
+- Projects mentioned: {projects}
+
+After each of the writer's responses, reply with only a thoughtful follow-up question that:
+1. Builds directly on their latest response
+2. Helps them go deeper or explore new angles
+3. References specific details from their content when relevant
+4. Guides them toward actionable writing directions
+5. Is conversational and encouraging
+
+If they seem to have exhausted a topic, pivot to exploring a different writing idea or connect to related content."""
+
 class ConversationState:
     """Manage conversation state and memory"""
     def __init__(self, memo_id, context):
@@ -310,6 +964,7 @@ class ConversationState:
         self.explored_topics = set()
         self.current_focus = None
         self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._summary_cache = None  # (exchange count, summary) of the last summary built
     
     def add_exchange(self, question, response, topic=None):
         """Add a question-response exchange to history"""
@@ -329,13 +984,64 @@ class ConversationState:
         if not self.conversation_history:
             return "No conversation yet."
         
-        summary = f"Conversation about {self.memo_id} ({len(self.conversation_history)} exchanges):\n"
+        # Only rebuilt once new exchanges arrive (or history is replaced on resume)
+        count = len(self.conversation_history)
+        if self._summary_cache and self._summary_cache[0] == count:
+            return self._summary_cache[1]
+        
+        summary = f"Conversation about {self.memo_id} ({count} exchanges):\n"
         for i, exchange in enumerate(self.conversation_history[-3:], 1):  # Last 3 exchanges
             summary += f"{i}. Q: {exchange['question'][:100]}...\n"
             summary += f"   A: {exchange['response'][:100]}...\n"
         
+        self._summary_cache = (count, summary)
         return summary
     
+    def followup_messages(self):
+        """Chat messages for the next follow-up question
+
+        The transcript and context live in a system message that stays the same for
+        the whole session, so Ollama can reuse its cached prefix; each turn only adds
+        the latest question and response. Once the history outgrows the token budget,
+        the oldest exchanges are left out.
+        """
+        # The ideas and projects get the same share of the window as related excerpts do elsewhere
+        writing_ideas, projects = pack_context(
+            [str(self.context['writing_ideas']), str(self.context['projects'])], RELATED_CONTEXT_TOKENS
+        )
+        system = FOLLOWUP_INSTRUCTIONS.format(
+            transcript=clip_to_tokens(self.context['main_memo']['transcript'], MAIN_TRANSCRIPT_TOKENS),
+            writing_ideas=writing_ideas,
+            related_memos=[r['memo_id'] for r in self.context['related_memos']],
+            projects=projects
+        )
+        budget = prompt_budget(system)
+        turns = []
+        for exchange in reversed(self.conversation_history):
+            question, response = exchange['question'], exchange['response']
+            cost = estimate_tokens(question) + estimate_tokens(response) + 16  # + message framing
+            if cost > budget:
+                if not turns:  # Always keep the latest exchange, clipped if need be
+                    question, response = pack_context([question, response], budget - 16)
+                    turns = [question, response]
+                break
+            budget -= cost
+            turns[:0] = [question, response]
+        
+        messages = [{"role": "system", "content": system}]
+        for question, response in zip(turns[::2], turns[1::2]):
+            messages.append({"role": "assistant", "content": question})
+            messages.append({"role": "user", "content": response})
+        return messages
+    
+    def packed_history(self, budget_tokens):
+        """The whole conversation as Q/A lines, clipped to fit a token budget"""
+        texts = []
+        for exchange in self.conversation_history:
+            texts += [exchange['question'], exchange['response']]
+        packed = pack_context(texts, budget_tokens)
+        return "\n".join(f"Q: {q}\nA: {a}" for q, a in zip(packed[::2], packed[1::2]))
+    
     def save_session(self):
         """Save the conversation session"""
         output_file = WRITING_DIR / f"{self.memo_id}_interactive_interview_{self.session_id}.json"
@@ -352,34 +1058,52 @@ class ConversationState:
             }
         }
         
-        with open(output_file, 'w') as f:
-            json.dump(session_data, f, indent=2)
-        
+        write_json(output_file, session_data)
         return output_file
 
+def ask_interviewer(prompt, fallback):
+    """Stream the interviewer's next question (from a prompt or chat messages) to the terminal"""
+    print("\nAI Interviewer: ", end="", flush=True)
+    call = chat_ollama if isinstance(prompt, list) else call_ollama
+    question = call(prompt, stream=True)
+    if not question:
+        question = fallback
+        print(question)
+    return question
+
+def _load_session_header(session_file):
+    """The listing details of one session file, or None if it can't be read"""
+    try:
+        data = read_json(session_file)
+        return {
+            'file': session_file,
+            'memo_id': data['memo_id'],
+            'session_id': data['session_id'],
+            'exchanges': len(data.get('conversation_history', [])),
+            'timestamp': data.get('timestamp', '')
+        }
+    except Exception:
+        return None
+
 def list_interview_sessions(memo_id=None):
     """List available interview sessions for resuming"""
-    pattern = f"{memo_id}_interactive_interview_*.json" if memo_id else "*_interactive_interview_*.json"
-    session_files = list(WRITING_DIR.glob(pattern))
+    # One directory scan; names are matched without a stat per file
+    prefix = f"{memo_id}_interactive_interview_" if memo_id else ""
+    with os.scandir(WRITING_DIR) as entries:
+        session_files = [
+            Path(entry.path) for entry in entries
+            if entry.name.startswith(prefix) and "_interactive_interview_" in entry.name
+            and entry.name.endswith(".json")
+        ]
     
     if not session_files:
         print("No interview sessions found.")
         return []
     
-    sessions = []
-    for session_file in sorted(session_files):
-        try:
-            with open(session_file, 'r') as f:
-                data = json.load(f)
-            sessions.append({
-                'file': session_file,
-                'memo_id': data['memo_id'],
-                'session_id': data['session_id'],
-                'exchanges': len(data.get('conversation_history', [])),
-                'timestamp': data.get('timestamp', '')
-            })
-        except Exception as e:
-            continue
+    # Read the session files in parallel, keeping their sorted order
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        headers = executor.map(_load_session_header, sorted(session_files))
+        sessions = [header for header in headers if header]
     
     print(f"\nFound {len(sessions)} interview sessions:")
     for i, session in enumerate(sessions, 1):
@@ -390,8 +1114,7 @@ def list_interview_sessions(memo_id=None):
 def resume_interview_session(session_file):
     """Resume an existing interview session"""
     try:
-        with open(session_file, 'r') as f:
-            session_data = json.load(f)
+        session_data = read_json(session_file)
     except Exception as e:
         print(f"Error loading session: {e}")
         return
@@ -417,13 +1140,14 @@ def resume_interview_session(session_file):
     print(conversation.get_conversation_summary())
     print("\nType 'quit' to end, 'summary' for overview, 'context' for related content\n")
     
-    # Generate continuation question
+    # Generate continuation question; the history gets what the transcript leaves
+    transcript = clip_to_tokens(context['main_memo']['transcript'], MAIN_TRANSCRIPT_TOKENS)
     continue_prompt = f"""You are an AI writing coach resuming an interview conversation.
 
-ORIGINAL MEMO: {context['main_memo']['transcript']}
+ORIGINAL MEMO: {transcript}
 
 CONVERSATION HISTORY:
-{conversation.get_conversation_summary()}
+{conversation.packed_history(prompt_budget(transcript))}
 
 The conversation was interrupted. Generate a question to resume the discussion that:
 1. Acknowledges the previous conversation
@@ -433,60 +1157,30 @@ The conversation was interrupted. Generate a question to resume the discussion t
 
 RESUMPTION QUESTION:"""
     
-    opening_question = call_ollama(continue_prompt)
-    if not opening_question:
-        opening_question = "Let's continue our conversation - what would you like to explore further from our previous discussion?"
+    opening_question = ask_interviewer(continue_prompt, "Let's continue our conversation - what would you like to explore further from our previous discussion?")
     
     # Continue conversation loop (same as original)
     while True:
-        print(f"\nAI Interviewer: {opening_question}")
         user_response = input("> ").strip()
         
         if user_response.lower() == 'quit':
             break
         elif user_response.lower() == 'summary':
             print(f"\n{conversation.get_conversation_summary()}")
+            print(f"\nAI Interviewer: {opening_question}")
             continue
         elif user_response.lower() == 'context':
             print(f"\nOriginal transcript: {context['main_memo']['transcript'][:300]}...")
             print(f"Related memos: {[r['memo_id'] for r in context['related_memos']]}")
+            print(f"\nAI Interviewer: {opening_question}")
             continue
         elif not user_response:
             continue
         
         conversation.add_exchange(opening_question, user_response)
         
-        # Generate follow-up (same prompt logic as original)
-        followup_prompt = f"""You are an AI writing coach having a conversation with a writer about their voice memo ideas.
-
-ORIGINAL MEMO TRANSCRIPT:
-{context['main_memo']['transcript']}
-
-CONVERSATION SO FAR:
-{conversation.get_conversation_summary()}
-
-WRITER'S LATEST RESPONSE:
-"{user_response}"
-
-AVAILABLE CONTEXT:
-- Writing ideas: {context['writing_ideas']}
-- Related memos: {[r['memo_id'] for r in context['related_memos']]}
-- Projects mentioned: {context['projects']}
-
-Generate a thoughtful follow-up question that:
-1. Builds directly on their latest response
-2. Helps them go deeper or explore new angles
-3. References specific details from their content when relevant
-4. Guides them toward actionable writing directions
-5. Is conversational and encouraging
-
-If they seem to have exhausted a topic, pivot to exploring a different writing idea or connect to related content.
-
-FOLLOW-UP QUESTION:"""
-        
-        opening_question = call_ollama(followup_prompt)
-        if not opening_question:
-            opening_question = "That's interesting! Can you elaborate on that idea?"
+        # Generate follow-up; the session's system message already carries the transcript
+        opening_question = ask_interviewer(conversation.followup_messages(), "That's interesting! Can you elaborate on that idea?")
     
     # Save updated session
     saved_file = conversation.save_session()
@@ -511,20 +1205,30 @@ def interactive_interview_mode(memo_id):
     # Initialize conversation state
     conversation = ConversationState(memo_id, context)
     
-    # Generate opening question using LLM
+    # Generate opening question using LLM; the ideas and suggested questions share
+    # what the transcript and related excerpts leave
+    transcript = clip_to_tokens(context['main_memo']['transcript'], MAIN_TRANSCRIPT_TOKENS)
+    related_excerpts = pack_context(
+        [(r['context'] or {}).get('transcript', '') for r in context['related_memos']],
+        RELATED_CONTEXT_TOKENS
+    )
+    writing_ideas, initial_questions = pack_context(
+        [json.dumps(context['writing_ideas'], indent=2), json.dumps(context['initial_questions'], indent=2)],
+        prompt_budget(transcript, *related_excerpts)
+    )
     opening_prompt = f"""You are an AI writing coach conducting an interview to help develop writing ideas from voice memos.
 
 MEMO TRANSCRIPT:
-{context['main_memo']['transcript']}
+{transcript}
 
 EXTRACTED WRITING IDEAS:
-{json.dumps(context['writing_ideas'], indent=2)}
+{writing_ideas}
 
 INITIAL SUGGESTED QUESTIONS:
-{json.dumps(context['initial_questions'], indent=2)}
+{initial_questions}
 
 RELATED CONTENT:
-{chr(10).join([f"- {r['memo_id']}: {r['context']['transcript'][:200]}..." for r in context['related_memos']])}
+{chr(10).join(f"- {r['memo_id']}: {excerpt}" for r, excerpt in zip(context['related_memos'], related_excerpts))}
 
 Generate an engaging opening question that:
 1. References specific content from the transcript
@@ -536,23 +1240,22 @@ Keep it conversational and specific to their content. Don't be generic.
 
 OPENING QUESTION:"""
     
-    opening_question = call_ollama(opening_prompt)
-    if not opening_question:
-        opening_question = "Tell me more about the ideas in this memo - what excites you most about developing them?"
+    opening_question = ask_interviewer(opening_prompt, "Tell me more about the ideas in this memo - what excites you most about developing them?")
     
     # Start conversation loop
     while True:
-        print(f"\nAI Interviewer: {opening_question}")
         user_response = input("> ").strip()
         
         if user_response.lower() == 'quit':
             break
         elif user_response.lower() == 'summary':
             print(f"\n{conversation.get_conversation_summary()}")
+            print(f"\nAI Interviewer: {opening_question}")
             continue
         elif user_response.lower() == 'context':
             print(f"\nOriginal transcript: {context['main_memo']['transcript'][:300]}...")
             print(f"Related memos: {[r['memo_id'] for r in context['related_memos']]}")
+            print(f"\nAI Interviewer: {opening_question}")
             continue
         elif not user_response:
             continue
@@ -560,37 +1263,8 @@ OPENING QUESTION:"""
         # Add to conversation history
         conversation.add_exchange(opening_question, user_response)
         
-        # Generate follow-up question using full context
-        followup_prompt = f"""You are an AI writing coach having a conversation with a writer about their voice memo ideas.
-
-ORIGINAL MEMO TRANSCRIPT:
-{context['main_memo']['transcript']}
-
-CONVERSATION SO FAR:
-{conversation.get_conversation_summary()}
-
-WRITER'S LATEST RESPONSE:
-"{user_response}"
-
-AVAILABLE CONTEXT:
-- Writing ideas: {context['writing_ideas']}
-- Related memos: {[r['memo_id'] for r in context['related_memos']]}
-- Projects mentioned: {context['projects']}
-
-Generate a thoughtful follow-up question that:
-1. Builds directly on their latest response
-2. Helps them go deeper or explore new angles
-3. References specific details from their content when relevant
-4. Guides them toward actionable writing directions
-5. Is conversational and encouraging
-
-If they seem to have exhausted a topic, pivot to exploring a different writing idea or connect to related content.
-
-FOLLOW-UP QUESTION:"""
-        
-        opening_question = call_ollama(followup_prompt)
-        if not opening_question:
-            opening_question = "That's interesting! Can you elaborate on that idea?"
+        # Generate follow-up; the session's system message already carries the transcript
+        opening_question = ask_interviewer(conversation.followup_messages(), "That's interesting! Can you elaborate on that idea?")
     
     # Save conversation
     saved_file = conversation.save_session()
@@ -600,12 +1274,13 @@ FOLLOW-UP QUESTION:"""
     if len(conversation.conversation_history) > 2:
         print("\nGenerating insights from our conversation...")
         
+        transcript = clip_to_tokens(context['main_memo']['transcript'], MAIN_TRANSCRIPT_TOKENS)
         insights_prompt = f"""Based on this writing interview conversation, provide insights and next steps for the writer.
 
-ORIGINAL MEMO: {context['main_memo']['transcript']}
+ORIGINAL MEMO: {transcript}
 
 FULL CONVERSATION:
-{chr(10).join([f"Q: {ex['question'][:200]}...{chr(10)}A: {ex['response'][:200]}..." for ex in conversation.conversation_history])}
+{conversation.packed_history(prompt_budget(transcript))}
 
 Provide:
 1. KEY THEMES that emerged from the conversation
@@ -617,11 +1292,9 @@ Be specific and actionable based on what they actually said.
 
 INSIGHTS:"""
         
-        insights = call_ollama(insights_prompt)
+        print(f"\n=== Writing Development Insights ===")
+        insights = call_ollama(insights_prompt, stream=True)
         if insights:
-            print(f"\n=== Writing Development Insights ===")
-            print(insights)
-            
             # Save insights to file
             insights_file = WRITING_DIR / f"{memo_id}_interview_insights_{conversation.session_id}.md"
             with open(insights_file, 'w') as f:
@@ -636,13 +1309,11 @@ def interview_mode(memo_id):
     """Interactive interview about a memo's content"""
     # Load memo and analysis
     transcript_file = VOICE_MEMOS_DIR / f"{memo_id}.txt"
-    writing_file = (ANALYSIS_DIR / "writing") / f"{memo_id}_writing.json"
     
     try:
         with open(transcript_file, 'r') as f:
             transcript = f.read()
-        with open(writing_file, 'r') as f:
-            writing_data = json.load(f)
+        writing_data = load_analysis(memo_id, 'writing')
     except FileNotFoundError as e:
         print(f"Files not found for {memo_id}: {e}")
         return
@@ -675,21 +1346,22 @@ def interview_mode(memo_id):
     
     # Save interview
     if interview_log:
-        output_file = WRITING_DIR / f"{memo_id}_interview_{datetime.now().strftime('%Y%m%d_%H%M')}.json"
-        with open(output_file, 'w') as f:
-            json.dump({
-                'memo_id': memo_id,
-                'timestamp': datetime.now().isoformat(),
-                'interview': interview_log
-            }, f, indent=2)
+        now = datetime.now()
+        output_file = WRITING_DIR / f"{memo_id}_interview_{now.strftime('%Y%m%d_%H%M')}.json"
+        write_json(output_file, {
+            'memo_id': memo_id,
+            'timestamp': now.isoformat(),
+            'interview': interview_log
+        })
         
         print(f"\nInterview saved to: {output_file}")
 
 def main():
-    global MODEL_NAME
+    global MODEL_NAME, SEMANTIC_CACHE, USE_CACHE, SEMANTIC_RELATED
     
     parser = argparse.ArgumentParser(description="Writing assistant for voice memos")
     parser.add_argument("--list-ideas", action="store_true", help="List all writing ideas")
+    parser.add_argument("--rebuild-index", action="store_true", help="Rebuild the writing ideas index from the stored analyses")
     parser.add_argument("--develop", help="Develop ideas from specific memo")
     parser.add_argument("--draft", nargs="+", help="Create draft from memo(s)")
     parser.add_argument("--interview", help="Interactive interview about a memo (legacy mode)")
@@ -697,14 +1369,30 @@ def main():
     parser.add_argument("--list-sessions", nargs="?", const="", help="List interview sessions (optionally for specific memo)")
     parser.add_argument("--resume", help="Resume interview session by session file path")
     parser.add_argument("--model", default=MODEL_NAME, help="Ollama model to use")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached responses and query Ollama again")
+    parser.add_argument("--semantic-cache", action="store_true",
+                        help=f"Reuse responses to near-identical --develop prompts (needs numpy and {EMBED_MODEL})")
+    parser.add_argument("--semantic-related", action="store_true",
+                        help=f"Find related memos by meaning with {EMBED_MODEL} embeddings (needs numpy)")
     
     args = parser.parse_args()
     
     MODEL_NAME = args.model
+    USE_CACHE = not args.no_cache
+    SEMANTIC_CACHE = args.semantic_cache
+    SEMANTIC_RELATED = args.semantic_related
+    if SEMANTIC_CACHE or SEMANTIC_RELATED:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            flag = "--semantic-cache" if SEMANTIC_CACHE else "--semantic-related"
+            parser.error(f"{flag} needs numpy (pip install numpy)")
     
     ensure_writing_dir()
     
-    if args.list_ideas:
+    if args.rebuild_index:
+        rebuild_writing_index()
+    elif args.list_ideas:
         list_writing_ideas()
     elif args.develop:
         develop_writing_idea(args.develop)